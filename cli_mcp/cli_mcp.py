@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 import asyncio
+import base64
+import json
 import logging
 import os
 import subprocess
+import sys
+import uuid
+from collections import OrderedDict
 from typing import Any, Sequence, Optional
 
 from mcp.server import Server
@@ -20,26 +25,139 @@ server = Server("cli")
 POWERSHELL_7_PATH = "C:\Program Files\PowerShell\7\pwsh.exe"
 DEFAULT_POWERSHELL_PATH = "powershell.exe"
 
-# 缓存PowerShell路径检测结果
-_cached_powershell_info = None
-
-async def get_powershell_info() -> tuple[str, str]:
-    """获取PowerShell路径和版本信息（缓存结果）
+def _resolve_powershell() -> tuple[str, str]:
+    """检测可用的PowerShell路径和版本信息
     
     Returns:
         tuple[str, str]: (powershell_path, powershell_version)
     """
-    global _cached_powershell_info
-    if _cached_powershell_info is None:
-        if os.path.exists(POWERSHELL_7_PATH):
-            _cached_powershell_info = (POWERSHELL_7_PATH, "PowerShell 7")
-        else:
-            _cached_powershell_info = (DEFAULT_POWERSHELL_PATH, "Windows Default PowerShell")
-    return _cached_powershell_info
+    if os.path.exists(POWERSHELL_7_PATH):
+        return POWERSHELL_7_PATH, "PowerShell 7"
+    return DEFAULT_POWERSHELL_PATH, "Windows Default PowerShell"
+
+# 启动时检测一次PowerShell路径
+_PWSH_PATH, _PWSH_VER = _resolve_powershell()
+
+# 单个输出流（stdout/stderr）最多保留的字节数，超出部分读取后丢弃
+MAX_OUTPUT_BYTES = 1024 * 1024
+_READ_CHUNK_SIZE = 65536
+
+async def _drain(stream: asyncio.StreamReader, buf: bytearray, limit: int) -> bool:
+    """持续读取输出流直到结束，最多保留 limit 字节
+    
+    Args:
+        stream: 子进程输出流
+        buf: 保存输出的缓冲区
+        limit: 最多保留的字节数
+        
+    Returns:
+        bool: 输出是否被截断
+    """
+    truncated = False
+    while True:
+        chunk = await stream.read(_READ_CHUNK_SIZE)
+        if not chunk:
+            return truncated
+        room = limit - len(buf)
+        if len(chunk) > room:
+            truncated = True
+            chunk = chunk[:max(room, 0)]
+        buf += chunk
+
+# 命令字符串最大长度（字符）
+MAX_COMMAND_LENGTH = 8192
+
+# 允许执行的命令白名单（命令的第一个单词，不区分大小写）
+# 通过环境变量 CLI_MCP_ALLOWED_COMMANDS 以逗号分隔配置，为空表示不限制
+# 配置白名单后拒绝包含语句分隔符、管道、调用运算符、换行或括号（子表达式）的命令，
+# 否则只检查第一个单词可以被 "Get-Date; Remove-Item ..." 之类的写法绕过。
+# 白名单内的命令本身（如 Invoke-Expression、Start-Process）仍可执行任意操作，需谨慎配置
+ALLOWED_COMMANDS = frozenset(
+    name.strip().lower()
+    for name in os.getenv("CLI_MCP_ALLOWED_COMMANDS", "").split(",")
+    if name.strip()
+)
+
+# 配置白名单时不允许出现在命令中的字符
+_CHAINING_CHARS = frozenset(";|&\n\r()")
+
+# 命令结果缓存：{(命令, PowerShell版本): 执行结果}，仅在调用方显式要求时使用
+RESULT_CACHE_SIZE = 64
+_RESULT_CACHE: "OrderedDict[tuple[str, str], dict]" = OrderedDict()
+
+def _check_command(command: str) -> Optional[str]:
+    """检查命令是否允许执行
+    
+    Args:
+        command: 要执行的命令字符串
+        
+    Returns:
+        Optional[str]: 不允许执行时返回原因，允许时返回None
+    """
+    if len(command) > MAX_COMMAND_LENGTH:
+        return f"命令长度超过限制（最多 {MAX_COMMAND_LENGTH} 个字符）"
+    if ALLOWED_COMMANDS:
+        head = command.lstrip().split(None, 1)
+        if not head or head[0].lower() not in ALLOWED_COMMANDS:
+            return f"命令不在允许列表中: {head[0] if head else ''}"
+        if not _CHAINING_CHARS.isdisjoint(command):
+            return "已配置命令白名单，命令中不能包含 ; | & ( ) 或换行"
+    return None
 
-async def run_command(command: str, timeout: int = 30) -> dict:
+async def _spawn(powershell_path: str, command: str) -> asyncio.subprocess.Process:
+    """启动PowerShell子进程执行命令"""
+    return await asyncio.create_subprocess_exec(
+        powershell_path,
+        "-Command",
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        stdin=asyncio.subprocess.DEVNULL
+    )
+
+async def run_command(command: str, timeout: int = 30, use_cache: bool = False) -> dict:
     """执行CLI命令
     
+    Args:
+        command: 要执行的命令字符串
+        timeout: 命令执行超时时间（秒）
+        use_cache: 是否复用相同命令的缓存结果（仅适用于只读、幂等的命令）
+        
+    Returns:
+        dict: 命令执行结果
+    """
+    reason = _check_command(command)
+    if reason:
+        logger.warning(f"拒绝执行命令: {reason}")
+        return {
+            "stdout": "",
+            "stderr": reason,
+            "returncode": -1,
+            "message": reason,
+            "powershell_version": _PWSH_VER
+        }
+    
+    # 常驻会话中当前目录和变量会在调用之间变化，相同命令的结果不能复用
+    if not use_cache or USE_PERSISTENT_SESSION:
+        return await _execute(command, timeout)
+    
+    key = (command, _PWSH_VER)
+    cached = _RESULT_CACHE.get(key)
+    if cached is not None:
+        _RESULT_CACHE.move_to_end(key)
+        return dict(cached, from_cache=True)
+    
+    result = await _execute(command, timeout)
+    # 仅缓存执行成功且输出完整的结果
+    if result["returncode"] == 0 and not result.get("truncated"):
+        _RESULT_CACHE[key] = result
+        while len(_RESULT_CACHE) > RESULT_CACHE_SIZE:
+            _RESULT_CACHE.popitem(last=False)
+    return result
+
+async def _execute_command(command: str, timeout: int) -> dict:
+    """启动PowerShell执行命令并收集输出
+    
     Args:
         command: 要执行的命令字符串
         timeout: 命令执行超时时间（秒）
@@ -47,9 +165,9 @@ async def run_command(command: str, timeout: int = 30) -> dict:
     Returns:
         dict: 命令执行结果
     """
+    global _PWSH_PATH, _PWSH_VER
     try:
-        # 获取PowerShell路径和版本信息（使用缓存）
-        powershell_path, powershell_version = await get_powershell_info()
+        powershell_path, powershell_version = _PWSH_PATH, _PWSH_VER
         
         # 仅在调试级别记录详细命令
         if logger.isEnabledFor(logging.DEBUG):
@@ -59,19 +177,25 @@ async def run_command(command: str, timeout: int = 30) -> dict:
             logger.info(f"使用 {powershell_version} 执行命令")
         
         # 执行命令
-        process = await asyncio.create_subprocess_exec(
-            powershell_path,
-            "-Command",
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            stdin=subprocess.PIPE
-        )
+        try:
+            process = await _spawn(powershell_path, command)
+        except FileNotFoundError:
+            # PowerShell可能在启动后被安装或卸载，重新检测后重试一次
+            _PWSH_PATH, _PWSH_VER = _resolve_powershell()
+            if _PWSH_PATH == powershell_path:
+                raise
+            powershell_path, powershell_version = _PWSH_PATH, _PWSH_VER
+            process = await _spawn(powershell_path, command)
         
-        # 等待命令执行完成，设置超时
+        # 边读边丢弃超出上限的输出，等待命令执行完成，设置超时
+        stdout, stderr = bytearray(), bytearray()
         try:
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
+            stdout_truncated, stderr_truncated, _ = await asyncio.wait_for(
+                asyncio.gather(
+                    _drain(process.stdout, stdout, MAX_OUTPUT_BYTES),
+                    _drain(process.stderr, stderr, MAX_OUTPUT_BYTES),
+                    process.wait()
+                ),
                 timeout=timeout
             )
         except asyncio.TimeoutError:
@@ -94,6 +218,7 @@ async def run_command(command: str, timeout: int = 30) -> dict:
             "stderr": stderr_str,
             "returncode": process.returncode,
             "message": "命令执行成功" if process.returncode == 0 else "命令执行失败",
+            "truncated": stdout_truncated or stderr_truncated,
             "powershell_version": powershell_version
         }
     except Exception as e:
@@ -106,13 +231,230 @@ async def run_command(command: str, timeout: int = 30) -> dict:
             "powershell_version": "未知"
         }
 
+# 是否复用常驻的PowerShell会话执行命令，避免每次调用都启动新进程
+# 默认关闭，每条命令使用独立进程执行、互不影响；设置环境变量 CLI_MCP_PERSISTENT_SESSION=1 开启。
+# 会话模式下当前目录、变量等状态会在调用之间保留，且会话的标准输入用于传递命令，
+# 不支持读取标准输入的命令（如 Read-Host、不带参数的 python、sort）
+USE_PERSISTENT_SESSION = os.getenv("CLI_MCP_PERSISTENT_SESSION", "0") == "1"
+
+def _append_limited(buf: bytearray, data: bytes, limit: int) -> bool:
+    """向缓冲区追加数据，最多保留 limit 字节，返回是否发生截断"""
+    room = limit - len(buf)
+    if len(data) > room:
+        buf += data[:max(room, 0)]
+        return True
+    buf += data
+    return False
+
+async def _read_until(stream: asyncio.StreamReader, marker: bytes, buf: bytearray, limit: int) -> bool:
+    """读取输出流直到出现结束标记，标记之前的内容最多保留 limit 字节
+    
+    Args:
+        stream: 会话输出流
+        marker: 结束标记
+        buf: 保存输出的缓冲区
+        limit: 最多保留的字节数
+        
+    Returns:
+        bool: 输出是否被截断
+    """
+    truncated = False
+    while True:
+        try:
+            data = await stream.readuntil(marker)
+        except asyncio.LimitOverrunError as e:
+            # 缓冲区中还没有结束标记，先取走不可能包含标记的部分
+            data = await stream.readexactly(e.consumed)
+            truncated |= _append_limited(buf, data, limit)
+            continue
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("PowerShell会话已退出")
+        truncated |= _append_limited(buf, data[:-len(marker)], limit)
+        return truncated
+
+class SessionUnavailableError(ConnectionError):
+    """会话无法启动或命令未能送达会话，命令尚未执行，可以安全地改用独立进程"""
+
+class PowerShellSession:
+    """常驻PowerShell会话
+    
+    通过 stdin 逐条发送命令，每条命令后输出带随机令牌的结束标记，
+    读取 stdout/stderr 直到结束标记出现即视为该命令执行完成。
+    """
+    
+    def __init__(self):
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.powershell_version = ""
+        self.lock = asyncio.Lock()
+    
+    def is_alive(self) -> bool:
+        """会话进程是否仍在运行"""
+        return self.process is not None and self.process.returncode is None
+    
+    async def start(self):
+        """启动会话进程"""
+        global _PWSH_PATH, _PWSH_VER
+        args = ("-NoLogo", "-NoProfile", "-NonInteractive", "-Command", "-")
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                _PWSH_PATH, *args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                stdin=subprocess.PIPE
+            )
+        except FileNotFoundError:
+            # PowerShell可能在启动后被安装或卸载，重新检测后重试一次
+            powershell_path = _PWSH_PATH
+            _PWSH_PATH, _PWSH_VER = _resolve_powershell()
+            if _PWSH_PATH == powershell_path:
+                raise
+            self.process = await asyncio.create_subprocess_exec(
+                _PWSH_PATH, *args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                stdin=subprocess.PIPE
+            )
+        self.powershell_version = _PWSH_VER
+        # 输出统一使用UTF-8编码，与结果解码方式一致
+        self.process.stdin.write(b"[Console]::OutputEncoding = [Text.Encoding]::UTF8\n")
+        await self.process.stdin.drain()
+    
+    async def close(self):
+        """结束会话进程"""
+        if self.is_alive():
+            self.process.kill()
+            await self.process.wait()
+        self.process = None
+    
+    async def run(self, command: str, timeout: int) -> dict:
+        """在会话中执行命令
+        
+        Args:
+            command: 要执行的命令字符串
+            timeout: 命令执行超时时间（秒）
+            
+        Returns:
+            dict: 命令执行结果
+            
+        Raises:
+            SessionUnavailableError: 会话无法启动或命令未能写入会话（命令未执行）
+        """
+        async with self.lock:
+            if not self.is_alive():
+                try:
+                    await self.start()
+                except Exception as e:
+                    await self.close()
+                    raise SessionUnavailableError(f"PowerShell会话启动失败: {e}")
+            
+            token = uuid.uuid4().hex
+            marker = f"__CLI_MCP_END_{token}__"
+            # 命令以Base64传递，避免引号、换行等字符破坏会话输入
+            encoded = base64.b64encode(command.encode("utf-8")).decode("ascii")
+            script = (
+                "$global:LASTEXITCODE = 0\n"
+                f"Invoke-Expression ([Text.Encoding]::UTF8.GetString([Convert]::FromBase64String('{encoded}')))\n"
+                "$__cli_mcp_rc = if ($?) { [int]$global:LASTEXITCODE } else { 1 }; "
+                f"[Console]::Error.WriteLine('{marker}'); "
+                f"[Console]::Out.WriteLine('{marker}' + $__cli_mcp_rc)\n"
+            )
+            
+            stdout, stderr = bytearray(), bytearray()
+            
+            async def read_stdout() -> tuple[bool, int]:
+                """读取stdout直到结束标记，标记后同一行是命令的退出码"""
+                truncated = await _read_until(self.process.stdout, marker.encode("ascii"), stdout, MAX_OUTPUT_BYTES)
+                line = await self.process.stdout.readline()
+                return truncated, int(line.strip() or 0)
+            
+            try:
+                self.process.stdin.write(script.encode("ascii"))
+            except Exception as e:
+                await self.close()
+                raise SessionUnavailableError(f"命令未能写入PowerShell会话: {e}")
+            
+            # 命令已发送，之后的任何失败都不能再重新执行，否则非幂等命令会被执行两次
+            try:
+                await self.process.stdin.drain()
+                (stdout_truncated, returncode), stderr_truncated = await asyncio.wait_for(
+                    asyncio.gather(
+                        read_stdout(),
+                        _read_until(self.process.stderr, marker.encode("ascii"), stderr, MAX_OUTPUT_BYTES)
+                    ),
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                # 超时的命令仍在会话中运行，只能结束整个会话，下次调用时重新启动
+                await self.close()
+                return {
+                    "stdout": "",
+                    "stderr": "命令执行超时",
+                    "returncode": -1,
+                    "message": "命令执行超时",
+                    "powershell_version": self.powershell_version
+                }
+            except Exception as e:
+                await self.close()
+                logger.error(f"PowerShell会话在命令执行过程中失败: {str(e)}")
+                message = f"PowerShell会话在命令执行过程中退出，命令可能已部分执行，未自动重试: {str(e)}"
+                return {
+                    "stdout": stdout.decode('utf-8', errors='replace').strip(),
+                    "stderr": message,
+                    "returncode": -1,
+                    "message": message,
+                    "powershell_version": self.powershell_version
+                }
+            
+            return {
+                "stdout": stdout.decode('utf-8', errors='replace').strip(),
+                "stderr": stderr.decode('utf-8', errors='replace').strip(),
+                "returncode": returncode,
+                "message": "命令执行成功" if returncode == 0 else "命令执行失败",
+                "truncated": stdout_truncated or stderr_truncated,
+                "powershell_version": self.powershell_version
+            }
+
+_session = PowerShellSession()
+
+async def _execute(command: str, timeout: int) -> dict:
+    """执行命令，优先使用常驻会话，会话不可用时回退到独立进程
+    
+    Args:
+        command: 要执行的命令字符串
+        timeout: 命令执行超时时间（秒）
+        
+    Returns:
+        dict: 命令执行结果
+    """
+    if USE_PERSISTENT_SESSION:
+        try:
+            # 仅在调试级别记录详细命令
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"在常驻会话中执行命令: {command}")
+            else:
+                logger.info("在常驻会话中执行命令")
+            return await _session.run(command, timeout)
+        except SessionUnavailableError as e:
+            logger.warning(f"常驻PowerShell会话不可用，改用独立进程执行: {str(e)}")
+    return await _execute_command(command, timeout)
+
+# 命令输出可能很长，已安装orjson时用它序列化返回结果
+try:
+    import orjson
+
+    def _dump(data: Any) -> str:
+        return orjson.dumps(data).decode("utf-8")
+except ImportError:
+    def _dump(data: Any) -> str:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
 @server.list_tools()
 async def handle_list_tools() -> list[Tool]:
     """返回可用工具列表"""
     return [
         Tool(
             name="execute_system_command",
-            description="执行系统命令，适用于需要在命令行中运行的各种操作，如文件管理、进程管理、网络操作等。默认使用PowerShell 7，如不存在则使用Windows默认PowerShell。",
+            description="执行系统命令，适用于需要在命令行中运行的各种操作，如文件管理、进程管理、网络操作等。默认使用PowerShell 7，如不存在则使用Windows默认PowerShell。每条命令默认在独立的PowerShell进程中执行；服务端设置 CLI_MCP_PERSISTENT_SESSION=1 时改为在同一个常驻会话中依次执行，变量和当前目录会在调用之间保留，且不支持读取标准输入的命令（如 Read-Host、不带参数的 python、sort）。服务端配置命令白名单时，只能执行白名单中的单条命令，命令中不能包含 ; | & ( ) 或换行。",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -123,6 +465,10 @@ async def handle_list_tools() -> list[Tool]:
                     "timeout": {
                         "type": "integer",
                         "description": "命令执行超时时间（秒），默认30秒，超过此时间命令将被强制终止"
+                    },
+                    "use_cache": {
+                        "type": "boolean",
+                        "description": "是否复用相同命令上次成功执行的结果，默认false，仅适用于只读、幂等的查询命令；常驻会话模式下不生效"
                     }
                 },
                 "required": ["command"]
@@ -135,22 +481,33 @@ async def handle_call_tool(name: str, arguments: dict | None) -> list[TextConten
     """处理工具调用"""
     if name == "execute_system_command":
         if not arguments or "command" not in arguments:
-            return [TextContent(type="text", text=str({"error": "缺少 command 参数"}))]
+            return [TextContent(type="text", text=_dump({"error": "缺少 command 参数"}))]
         command = arguments["command"]
         timeout = arguments.get("timeout", 30)
-        result = await run_command(command, timeout)
-        return [TextContent(type="text", text=str(result))]
+        use_cache = arguments.get("use_cache", False)
+        result = await run_command(command, timeout, use_cache)
+        return [TextContent(type="text", text=_dump(result))]
     else:
         raise ValueError(f"未知工具: {name}")
 
 async def main():
     """主函数"""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        await _session.close()
 
 if __name__ == "__main__":
+    # 非Windows平台优先使用uvloop事件循环（uvloop不支持Windows）
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
     asyncio.run(main())
@@ -6,9 +6,12 @@ Excel测试用例管理MCP服务
 """
 
 import asyncio
+import json
 import logging
 import sys
 import os
+import threading
+from collections import OrderedDict
 from typing import Any, Sequence
 from datetime import datetime
 
@@ -28,22 +31,179 @@ logger = logging.getLogger("excel-mcp-server")
 # 创建服务器实例
 server = Server("excel-testcase-manager")
 
-async def read_excel_file(file_path: str) -> dict:
+# 工作簿缓存配置
+WB_CACHE_SIZE = 8  # 最多缓存的工作簿数量
+FLUSH_DELAY = 0.5  # 修改后延迟写盘时间（秒）
+
+# 工作簿缓存：{绝对路径: [管理器, 加载/保存时的文件版本(mtime_ns, size), 是否有未保存修改]}
+# 缓存会在工作线程中访问，因此使用 threading.Lock 而不是 asyncio.Lock
+_WB_CACHE: "OrderedDict[str, list]" = OrderedDict()
+_WB_LOCKS: dict[str, threading.Lock] = {}
+_CACHE_LOCK = threading.Lock()  # 保护缓存结构本身
+_FLUSH_HANDLES: dict[str, asyncio.TimerHandle] = {}  # 仅在事件循环线程中访问
+_FLUSH_TASKS: set[asyncio.Future] = set()  # 进行中的写盘任务，保留引用防止被回收
+_FLUSH_ERRORS: dict[str, str] = {}  # 延迟写盘失败的原因，在该文件的下一次调用时返回
+
+def _lock_for(path: str) -> threading.Lock:
+    """获取指定文件的锁，用于串行化对同一文件的操作"""
+    with _CACHE_LOCK:
+        lock = _WB_LOCKS.get(path)
+        if lock is None:
+            lock = _WB_LOCKS[path] = threading.Lock()
+        return lock
+
+def _file_version(path: str) -> tuple[int, int]:
+    """返回文件版本标识 (修改时间纳秒, 文件大小)"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def _flush(path: str):
+    """将缓存中有未保存修改的工作簿写回磁盘（调用方需持有该文件的锁）
+    
+    磁盘上的文件在加载后被改动过时拒绝保存，避免旧的工作簿覆盖更新的文件
     """
-    读取Excel文件
+    entry = _WB_CACHE.get(path)
+    if entry is None or not entry[2]:
+        return
+    if _file_version(path) != entry[1]:
+        entry[2] = False
+        raise Exception(f"文件已被外部修改，未保存的修改已丢弃: {path}")
+    manager = entry[0]
+    manager.save()
+    entry[1] = _file_version(path)
+    entry[2] = False
+
+def _record_flush_error(path: str, error: Exception):
+    """记录延迟写盘失败的原因"""
+    logger.error(f"保存Excel文件时发生错误 [{path}]: {str(error)}")
+    with _CACHE_LOCK:
+        _FLUSH_ERRORS[path] = str(error)
+
+def _with_flush_error(path: str, result: dict) -> dict:
+    """如果该文件此前的延迟写盘失败，将失败原因附加到本次返回结果中"""
+    with _CACHE_LOCK:
+        error = _FLUSH_ERRORS.pop(path, None)
+    if error:
+        result["message"] = f"{result['message']}（注意：此前的修改未能保存: {error}）"
+    return result
+
+def _locked_flush(path: str):
+    """获取文件锁后写盘"""
+    with _lock_for(path):
+        try:
+            _flush(path)
+        except Exception as e:
+            _record_flush_error(path, e)
+
+def _cancel_pending_flushes():
+    """取消所有尚未触发的延迟写盘定时器（需在事件循环线程中调用）"""
+    for handle in _FLUSH_HANDLES.values():
+        handle.cancel()
+    _FLUSH_HANDLES.clear()
+
+def _flush_all():
+    """保存所有有未保存修改的工作簿"""
+    with _CACHE_LOCK:
+        paths = list(_WB_CACHE)
+    for path in paths:
+        _locked_flush(path)
+
+def _evict(path: str):
+    """从缓存中移除工作簿，移除前保存未保存的修改（调用方需持有该文件的锁）"""
+    try:
+        _flush(path)
+    finally:
+        with _CACHE_LOCK:
+            entry = _WB_CACHE.pop(path, None)
+        if entry is not None:
+            entry[0].close()
+
+def _shrink_cache(keep: str):
+    """超出容量时淘汰最久未使用的工作簿，跳过正在使用中的文件"""
+    with _CACHE_LOCK:
+        excess = len(_WB_CACHE) - WB_CACHE_SIZE
+        candidates = [p for p in _WB_CACHE if p != keep]
+    for victim in candidates:
+        if excess <= 0:
+            break
+        lock = _lock_for(victim)
+        if not lock.acquire(blocking=False):
+            continue
+        try:
+            _evict(victim)
+        except Exception as e:
+            _record_flush_error(victim, e)
+        finally:
+            lock.release()
+        excess -= 1
+
+def _get_manager(path: str) -> TestCaseExcelManager:
+    """
+    从缓存获取可写的工作簿管理器，缓存未命中或文件已被外部修改时重新加载
+    （调用方需持有该文件的锁）
     
     Args:
-        file_path: Excel文件路径
+        path: Excel文件绝对路径
     
     Returns:
-        读取结果
+        已打开的测试用例管理器
     """
+    version = _file_version(path)
+    entry = _WB_CACHE.get(path)
+    if entry is not None:
+        if entry[1] == version:
+            with _CACHE_LOCK:
+                _WB_CACHE.move_to_end(path)
+            return entry[0]
+        try:
+            _flush(path)
+        except Exception as e:
+            _record_flush_error(path, e)
+        _evict(path)
+    
+    manager = TestCaseExcelManager(path)
+    if not manager.open():
+        raise Exception(f"打开文件失败: {path}")
+    with _CACHE_LOCK:
+        _WB_CACHE[path] = [manager, version, False]
+    _shrink_cache(path)
+    return manager
+
+def _flush_done(task: asyncio.Future):
+    """写盘任务结束后移除引用，并取出异常避免被静默丢弃"""
+    _FLUSH_TASKS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"写盘任务异常: {str(task.exception())}")
+
+def _schedule_flush(path: str):
+    """（重新）安排延迟写盘，需在事件循环线程中调用"""
+    handle = _FLUSH_HANDLES.get(path)
+    if handle is not None:
+        handle.cancel()
+    
+    def _fire():
+        _FLUSH_HANDLES.pop(path, None)
+        task = asyncio.ensure_future(asyncio.to_thread(_locked_flush, path))
+        _FLUSH_TASKS.add(task)
+        task.add_done_callback(_flush_done)
+    
+    _FLUSH_HANDLES[path] = asyncio.get_running_loop().call_later(FLUSH_DELAY, _fire)
+
+def _sync_read(file_path: str) -> dict:
+    """读取Excel文件（在工作线程中执行）"""
     try:
-        manager = TestCaseExcelManager(file_path)
-        manager.open()
-        
-        testcases = manager.read_testcases()
-        manager.close()
+        path = os.path.abspath(file_path)
+        with _lock_for(path):
+            # 缓存中的工作簿以 data_only=False 加载（公式单元格为公式字符串），
+            # 读取统一走只读路径返回单元格的计算值：有未写盘的修改时先保存
+            try:
+                _flush(path)
+            except Exception as e:
+                _record_flush_error(path, e)
+            manager = TestCaseExcelManager(file_path, read_only=True)
+            manager.open()
+            testcases = manager.read_testcases()
+            manager.close()
         
         return {
             "file_path": file_path,
@@ -60,20 +220,34 @@ async def read_excel_file(file_path: str) -> dict:
             "message": f"读取Excel文件时发生错误: {str(e)}"
         }
 
-async def write_excel_file(testcases: list[dict], output_path: str) -> dict:
+async def read_excel_file(file_path: str) -> dict:
     """
-    写入Excel文件
+    读取Excel文件
     
     Args:
-        testcases: 测试用例列表
-        output_path: 输出文件路径
+        file_path: Excel文件路径
     
     Returns:
-        写入结果
+        读取结果
     """
+    result = await asyncio.to_thread(_sync_read, file_path)
+    return _with_flush_error(os.path.abspath(file_path), result)
+
+def _sync_write(testcases: list[dict], output_path: str) -> dict:
+    """写入Excel文件（在工作线程中执行）"""
     try:
-        creator = TestCaseExcelCreator()
-        success = creator.create_new_file(testcases, output_path)
+        path = os.path.abspath(output_path)
+        with _lock_for(path):
+            # 新文件会整体覆盖目标文件，丢弃该路径的缓存工作簿，
+            # 避免之后的延迟写盘用旧内容覆盖新文件
+            with _CACHE_LOCK:
+                entry = _WB_CACHE.pop(path, None)
+            if entry is not None:
+                if entry[2]:
+                    logger.warning(f"文件将被覆盖，丢弃未保存的修改: {path}")
+                entry[0].close()
+            creator = TestCaseExcelCreator()
+            success = creator.create_new_file(testcases, output_path)
         
         if success:
             return {
@@ -95,24 +269,28 @@ async def write_excel_file(testcases: list[dict], output_path: str) -> dict:
             "message": f"写入Excel文件时发生错误: {str(e)}"
         }
 
-async def update_excel_file(file_path: str, row: int, testcase: dict) -> dict:
+async def write_excel_file(testcases: list[dict], output_path: str) -> dict:
     """
-    更新Excel文件中的测试用例
+    写入Excel文件
     
     Args:
-        file_path: Excel文件路径
-        row: 行号（从2开始）
-        testcase: 测试用例数据
+        testcases: 测试用例列表
+        output_path: 输出文件路径
     
     Returns:
-        更新结果
+        写入结果
     """
+    result = await asyncio.to_thread(_sync_write, testcases, output_path)
+    return _with_flush_error(os.path.abspath(output_path), result)
+
+def _sync_update(file_path: str, row: int, testcase: dict) -> dict:
+    """更新Excel文件中的测试用例（在工作线程中执行）"""
     try:
-        manager = TestCaseExcelManager(file_path)
-        manager.open()
-        manager.update_testcase(row, testcase)
-        manager.save()
-        manager.close()
+        path = os.path.abspath(file_path)
+        with _lock_for(path):
+            manager = _get_manager(path)
+            manager.update_testcase(row, testcase)
+            _WB_CACHE[path][2] = True
         
         return {
             "file_path": file_path,
@@ -129,23 +307,31 @@ async def update_excel_file(file_path: str, row: int, testcase: dict) -> dict:
             "message": f"更新Excel文件时发生错误: {str(e)}"
         }
 
-async def add_excel_testcase(file_path: str, testcase: dict) -> dict:
+async def update_excel_file(file_path: str, row: int, testcase: dict) -> dict:
     """
-    向Excel文件添加测试用例
+    更新Excel文件中的测试用例
     
     Args:
         file_path: Excel文件路径
+        row: 行号（从2开始）
         testcase: 测试用例数据
     
     Returns:
-        添加结果
+        更新结果
     """
+    result = await asyncio.to_thread(_sync_update, file_path, row, testcase)
+    path = os.path.abspath(file_path)
+    _schedule_flush(path)
+    return _with_flush_error(path, result)
+
+def _sync_add(file_path: str, testcase: dict) -> dict:
+    """向Excel文件添加测试用例（在工作线程中执行）"""
     try:
-        manager = TestCaseExcelManager(file_path)
-        manager.open()
-        manager.add_testcase(testcase)
-        manager.save()
-        manager.close()
+        path = os.path.abspath(file_path)
+        with _lock_for(path):
+            manager = _get_manager(path)
+            manager.add_testcase(testcase)
+            _WB_CACHE[path][2] = True
         
         return {
             "file_path": file_path,
@@ -160,37 +346,91 @@ async def add_excel_testcase(file_path: str, testcase: dict) -> dict:
             "message": f"添加测试用例时发生错误: {str(e)}"
         }
 
-async def delete_excel_testcase(file_path: str, row: int) -> dict:
+async def add_excel_testcase(file_path: str, testcase: dict) -> dict:
     """
-    从Excel文件删除测试用例
+    向Excel文件添加测试用例
     
     Args:
         file_path: Excel文件路径
-        row: 行号（从2开始）
+        testcase: 测试用例数据
     
     Returns:
-        删除结果
+        添加结果
     """
+    result = await asyncio.to_thread(_sync_add, file_path, testcase)
+    path = os.path.abspath(file_path)
+    _schedule_flush(path)
+    return _with_flush_error(path, result)
+
+def _sync_delete(file_path: str, rows: list[int]) -> dict:
+    """从Excel文件批量删除测试用例（在工作线程中执行）"""
     try:
-        manager = TestCaseExcelManager(file_path)
-        manager.open()
-        manager.delete_testcase(row)
-        manager.save()
-        manager.close()
+        path = os.path.abspath(file_path)
+        with _lock_for(path):
+            manager = _get_manager(path)
+            manager.delete_testcases(rows)
+            _WB_CACHE[path][2] = True
         
         return {
             "file_path": file_path,
-            "row": row,
+            "rows": rows,
             "message": "删除成功"
         }
     except Exception as e:
         logger.error(f"删除测试用例时发生错误: {str(e)}")
         return {
             "file_path": file_path,
-            "row": row,
+            "rows": rows,
             "message": f"删除测试用例时发生错误: {str(e)}"
         }
 
+async def delete_excel_testcases(file_path: str, rows: list[int]) -> dict:
+    """
+    从Excel文件批量删除测试用例
+    
+    Args:
+        file_path: Excel文件路径
+        rows: 行号列表（从2开始）
+    
+    Returns:
+        删除结果
+    """
+    result = await asyncio.to_thread(_sync_delete, file_path, rows)
+    path = os.path.abspath(file_path)
+    _schedule_flush(path)
+    return _with_flush_error(path, result)
+
+async def delete_excel_testcase(file_path: str, row: int) -> dict:
+    """
+    从Excel文件删除测试用例
+    
+    Args:
+        file_path: Excel文件路径
+        row: 行号（从2开始）
+    
+    Returns:
+        删除结果
+    """
+    result = await delete_excel_testcases(file_path, [row])
+    return {
+        "file_path": file_path,
+        "row": row,
+        "message": result["message"]
+    }
+
+# 单元格可能是日期等非JSON类型，统一用 str() 输出（已安装orjson时优先使用）
+try:
+    import orjson
+
+    def _dump(data: Any) -> str:
+        """序列化工具返回结果"""
+        # 日期时间交给 default=str 处理，与标准库回退的格式保持一致
+        return orjson.dumps(data, default=str, option=orjson.OPT_PASSTHROUGH_DATETIME).decode("utf-8")
+except ImportError:
+    def _dump(data: Any) -> str:
+        """序列化工具返回结果"""
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
 @server.list_tools()
 async def handle_list_tools() -> list[Tool]:
     """返回可用工具列表"""
@@ -365,6 +605,27 @@ async def handle_list_tools() -> list[Tool]:
                 },
                 "required": ["file_path", "row"]
             },
+        ),
+        Tool(
+            name="delete_excel_testcases",
+            description="从Excel测试用例文件批量删除多行测试用例",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "file_path": {
+                        "type": "string",
+                        "description": "Excel文件路径"
+                    },
+                    "rows": {
+                        "type": "array",
+                        "items": {
+                            "type": "integer"
+                        },
+                        "description": "行号列表（从2开始，第1行是表头）"
+                    }
+                },
+                "required": ["file_path", "rows"]
+            },
         )
     ]
 
@@ -373,50 +634,70 @@ async def handle_call_tool(name: str, arguments: dict | None) -> list[TextConten
     """处理工具调用"""
     if name == "read_excel":
         if not arguments or "file_path" not in arguments:
-            return [TextContent(type="text", text=str({"error": "缺少 file_path 参数"}))]
+            return [TextContent(type="text", text=_dump({"error": "缺少 file_path 参数"}))]
         file_path = arguments["file_path"]
         result = await read_excel_file(file_path)
-        return [TextContent(type="text", text=str(result))]
+        return [TextContent(type="text", text=_dump(result))]
     elif name == "write_excel":
         if not arguments or "testcases" not in arguments or "output_path" not in arguments:
-            return [TextContent(type="text", text=str({"error": "缺少 testcases 或 output_path 参数"}))]
+            return [TextContent(type="text", text=_dump({"error": "缺少 testcases 或 output_path 参数"}))]
         testcases = arguments["testcases"]
         output_path = arguments["output_path"]
         result = await write_excel_file(testcases, output_path)
-        return [TextContent(type="text", text=str(result))]
+        return [TextContent(type="text", text=_dump(result))]
     elif name == "update_excel":
         if not arguments or "file_path" not in arguments or "row" not in arguments or "testcase" not in arguments:
-            return [TextContent(type="text", text=str({"error": "缺少 file_path、row 或 testcase 参数"}))]
+            return [TextContent(type="text", text=_dump({"error": "缺少 file_path、row 或 testcase 参数"}))]
         file_path = arguments["file_path"]
         row = arguments["row"]
         testcase = arguments["testcase"]
         result = await update_excel_file(file_path, row, testcase)
-        return [TextContent(type="text", text=str(result))]
+        return [TextContent(type="text", text=_dump(result))]
     elif name == "add_excel_testcase":
         if not arguments or "file_path" not in arguments or "testcase" not in arguments:
-            return [TextContent(type="text", text=str({"error": "缺少 file_path 或 testcase 参数"}))]
+            return [TextContent(type="text", text=_dump({"error": "缺少 file_path 或 testcase 参数"}))]
         file_path = arguments["file_path"]
         testcase = arguments["testcase"]
         result = await add_excel_testcase(file_path, testcase)
-        return [TextContent(type="text", text=str(result))]
+        return [TextContent(type="text", text=_dump(result))]
     elif name == "delete_excel_testcase":
         if not arguments or "file_path" not in arguments or "row" not in arguments:
-            return [TextContent(type="text", text=str({"error": "缺少 file_path 或 row 参数"}))]
+            return [TextContent(type="text", text=_dump({"error": "缺少 file_path 或 row 参数"}))]
         file_path = arguments["file_path"]
         row = arguments["row"]
         result = await delete_excel_testcase(file_path, row)
-        return [TextContent(type="text", text=str(result))]
+        return [TextContent(type="text", text=_dump(result))]
+    elif name == "delete_excel_testcases":
+        if not arguments or "file_path" not in arguments or "rows" not in arguments:
+            return [TextContent(type="text", text=_dump({"error": "缺少 file_path 或 rows 参数"}))]
+        file_path = arguments["file_path"]
+        rows = arguments["rows"]
+        result = await delete_excel_testcases(file_path, rows)
+        return [TextContent(type="text", text=_dump(result))]
     else:
         raise ValueError(f"未知工具: {name}")
 
 async def main():
     """主函数"""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        # 退出前先取消定时器并等待进行中的写盘任务，再统一保存剩余修改，避免重复写盘
+        _cancel_pending_flushes()
+        if _FLUSH_TASKS:
+            await asyncio.gather(*_FLUSH_TASKS, return_exceptions=True)
+        _flush_all()
 
 if __name__ == "__main__":
+    # 已安装uvloop时使用uvloop事件循环
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main())
\ No newline at end of file
@@ -6,11 +6,66 @@ Excel测试用例管理工具
 支持完整的Excel操作，包括格式保持和中文内容处理
 """
 
-import pandas as pd
 from openpyxl import load_workbook, Workbook
 from openpyxl.styles import Font, Alignment, Border, Side
-from typing import List, Dict, Any, Optional
-import copy
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+import io
+import logging
+import os
+from operator import itemgetter
+
+# MCP服务通过stdout通信，日志统一输出到logging（stderr），不要使用print
+logger = logging.getLogger(__name__)
+
+# 列号字母缓存（A, B, C ... BL）
+_COL_LETTERS = tuple(get_column_letter(i) for i in range(1, 65))
+
+
+def _atomic_write(path: str, data: bytes):
+    """
+    原子地写入文件：先写临时文件，再替换目标文件
+    
+    Args:
+        path: 目标文件路径
+        data: 文件内容
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@lru_cache(maxsize=8)
+def _read_sheet_values(path: str, mtime_ns: int, size: int) -> Tuple[str, tuple, tuple]:
+    """
+    以只读模式读取第一个工作表的全部单元格值
+    
+    以文件路径、修改时间和大小作为缓存键，文件未变化时直接复用上次的解析结果
+    
+    Args:
+        path: xlsx文件绝对路径
+        mtime_ns: 文件修改时间（纳秒）
+        size: 文件大小（字节）
+    
+    Returns:
+        (工作表名称, 表头元组, 数据行元组)
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        # 与原先 pd.read_excel(sheet_name=0) 一致，读取第一个工作表而不是活动工作表
+        ws = wb.worksheets[0]
+        rows = tuple(ws.iter_rows(values_only=True))
+        return ws.title, (rows[0] if rows else ()), rows[1:]
+    finally:
+        wb.close()
 
 
 class TestCaseExcelManager:
@@ -28,55 +83,93 @@ class TestCaseExcelManager:
         "编辑模式"
     ]
     
-    def __init__(self, file_path: str):
+    # (列号, 列名) 对照，列号从1开始
+    _COL_INDEX = tuple(enumerate(COLUMNS, 1))
+    
+    def __init__(self, file_path: str, read_only: bool = False):
         """
         初始化管理器
         
         Args:
             file_path: xlsx文件路径
+            read_only: 是否以只读模式打开（仅读取时使用，首次修改时自动切换为可写模式）
         """
         self.file_path = file_path
+        self.read_only = read_only
         self.wb = None
         self.ws = None
-        self.data = None
+        self.header = None
+        self.rows = None
     
     def open(self):
         """打开现有Excel文件"""
         try:
-            self.wb = load_workbook(self.file_path, data_only=False)
-            self.ws = self.wb.active
-            # 使用pandas读取数据
-            self.data = pd.read_excel(self.file_path, sheet_name=0, engine='openpyxl')
-            print(f"成功打开文件: {self.file_path}")
-            print(f"工作表: {self.ws.title}")
-            print(f"数据行数: {len(self.data)}")
+            if self.read_only:
+                # 只读模式：直接使用按文件版本缓存的单元格值（公式单元格取计算值），不保留工作簿
+                stat = os.stat(self.file_path)
+                title, self.header, self.rows = _read_sheet_values(
+                    os.path.abspath(self.file_path), stat.st_mtime_ns, stat.st_size
+                )
+            else:
+                # 可写模式需要保存回文件，保留公式本身（读取时公式单元格为公式字符串）
+                self.wb = load_workbook(self.file_path, data_only=False)
+                self.ws = self.wb.active
+                self.header = None
+                self.rows = None
+                title = self.ws.title
+            logger.debug(f"成功打开文件: {self.file_path}")
+            logger.debug(f"工作表: {title}")
             return True
         except Exception as e:
-            print(f"打开文件失败: {e}")
+            logger.error(f"打开文件失败: {e}")
             return False
     
-    def read_testcases(self) -> List[Dict[str, Any]]:
+    def _ensure_writable(self):
+        """只读模式下首次修改前，重新以可写模式加载工作簿"""
+        if not self.read_only or self.rows is None:
+            return
+        self.read_only = False
+        self.open()
+    
+    def _load_rows(self):
+        """获取表头和数据行（值元组）"""
+        if self.rows is not None:
+            return self.header, self.rows
+        rows = self.ws.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        return header, rows
+    
+    def read_testcases_raw(self) -> List[tuple]:
         """
-        读取所有测试用例
+        读取所有测试用例的原始值，不构造字典
         
         Returns:
-            测试用例列表，每个用例为字典格式
+            测试用例列表，每个用例为按 COLUMNS 顺序排列的元组，空单元格为None
         """
-        if self.data is None:
+        if self.ws is None and self.rows is None:
             self.open()
         
-        testcases = []
-        for idx, row in self.data.iterrows():
-            testcase = {}
-            for col in self.COLUMNS:
-                value = row.get(col, "")
-                # 处理NaN值
-                if pd.isna(value):
-                    value = ""
-                testcase[col] = value
-            testcases.append(testcase)
+        header, rows = self._load_rows()
+        # 按标准列顺序重排每行的取值函数，缺失的列指向行尾补齐的None
+        width = len(header)
+        pad = (None,) * (width + 1)
+        reindex = itemgetter(*[header.index(col) if col in header else width for col in self.COLUMNS])
+        
+        return [
+            reindex(row[:width] + pad)
+            for row in rows
+            # 跳过空行
+            if any(v is not None for v in row)
+        ]
+    
+    def read_testcases(self) -> List[Dict[str, Any]]:
+        """
+        读取所有测试用例
         
-        return testcases
+        Returns:
+            测试用例列表，每个用例为字典格式
+        """
+        return _rows_to_dicts(self.read_testcases_raw())
     
     def read_testcase_by_name(self, name: str) -> Optional[Dict[str, Any]]:
         """
@@ -88,10 +181,11 @@ class TestCaseExcelManager:
         Returns:
             找到的测试用例，未找到返回None
         """
-        testcases = self.read_testcases()
-        for tc in testcases:
-            if tc["用例名称"] == name:
-                return tc
+        name_idx = self.COLUMNS.index("用例名称")
+        for row in self.read_testcases_raw():
+            value = row[name_idx]
+            if (value if value is not None else "") == name:
+                return _rows_to_dicts([row])[0]
         return None
     
     def get_cell_value(self, row: int, column: str) -> Any:
@@ -110,29 +204,22 @@ class TestCaseExcelManager:
         cell = self.ws[f"{column}{row}"]
         return cell.value
     
-    def update_cell(self, row: int, column: str, value: Any, preserve_format: bool = True):
+    def update_cell(self, row: int, column: str, value: Any):
         """
-        更新指定单元格的值
+        更新指定单元格的值（只修改值，保持原有格式）
         
         Args:
             row: 行号（从1开始）
             column: 列号（A, B, C...）
             value: 新值
-            preserve_format: 是否保持原有格式
         """
+        self._ensure_writable()
         if self.ws is None:
             raise Exception("工作表未打开")
         
-        cell = self.ws[f"{column}{row}"]
-        
-        if preserve_format:
-            # 保持原有格式，只修改值
-            old_cell = copy.copy(cell)
-            cell.value = value
-        else:
-            cell.value = value
+        self.ws[f"{column}{row}"].value = value
         
-        print(f"更新单元格 {column}{row}: {value}")
+        logger.debug(f"更新单元格 {column}{row}: {value}")
     
     def update_testcase(self, row: int, testcase: Dict[str, Any]):
         """
@@ -142,23 +229,14 @@ class TestCaseExcelManager:
             row: 行号（从2开始，第1行是表头）
             testcase: 测试用例数据字典
         """
+        self._ensure_writable()
         if self.ws is None:
             raise Exception("工作表未打开")
         
-        col_map = {
-            "用例名称": "A",
-            "前置条件": "B",
-            "所属模块": "C",
-            "步骤描述": "D",
-            "预期结果": "E",
-            "备注": "F",
-            "用例等级": "G",
-            "编辑模式": "H"
-        }
-        
-        for col_name, col_letter in col_map.items():
+        for col_idx, col_name in self._COL_INDEX:
             if col_name in testcase:
-                self.update_cell(row, col_letter, testcase[col_name])
+                self.ws.cell(row=row, column=col_idx).value = testcase[col_name]
+        logger.debug(f"更新第{row}行测试用例")
     
     def add_testcase(self, testcase: Dict[str, Any]):
         """
@@ -167,6 +245,7 @@ class TestCaseExcelManager:
         Args:
             testcase: 测试用例数据字典
         """
+        self._ensure_writable()
         if self.ws is None:
             raise Exception("工作表未打开")
         
@@ -178,7 +257,7 @@ class TestCaseExcelManager:
                 testcase[col] = ""
         
         self.update_testcase(new_row, testcase)
-        print(f"添加新用例到第{new_row}行")
+        logger.debug(f"添加新用例到第{new_row}行")
     
     def delete_testcase(self, row: int):
         """
@@ -187,12 +266,43 @@ class TestCaseExcelManager:
         Args:
             row: 行号（从2开始）
         """
+        self.delete_testcases([row])
+    
+    @staticmethod
+    def _runs(rows: List[int]) -> List[Tuple[int, int]]:
+        """
+        将降序排列的行号合并为连续区间
+        
+        Args:
+            rows: 降序排列且不重复的行号列表
+        
+        Returns:
+            (起始行号, 行数) 列表，按行号从大到小排列
+        """
+        runs = []
+        for row in rows:
+            if runs and runs[-1][0] == row + 1:
+                runs[-1] = (row, runs[-1][1] + 1)
+            else:
+                runs.append((row, 1))
+        return runs
+    
+    def delete_testcases(self, rows: List[int]):
+        """
+        批量删除多行测试用例
+        
+        从下往上删除，并将连续的行合并为一次删除，避免反复移动后续行
+        
+        Args:
+            rows: 行号列表（从2开始）
+        """
+        self._ensure_writable()
         if self.ws is None:
             raise Exception("工作表未打开")
         
-        # 删除该行
-        self.ws.delete_rows(row, 1)
-        print(f"删除第{row}行的测试用例")
+        for start, count in self._runs(sorted(set(rows), reverse=True)):
+            self.ws.delete_rows(start, count)
+            logger.debug(f"删除第{start}至{start + count - 1}行的测试用例")
     
     def save(self, new_path: Optional[str] = None):
         """
@@ -205,14 +315,17 @@ class TestCaseExcelManager:
             raise Exception("工作簿未打开")
         
         save_path = new_path if new_path else self.file_path
-        self.wb.save(save_path)
-        print(f"文件已保存: {save_path}")
+        # 先在内存中完成序列化，再整体替换目标文件，避免写入中途失败留下损坏的文件
+        buf = io.BytesIO()
+        self.wb.save(buf)
+        _atomic_write(save_path, buf.getvalue())
+        logger.debug(f"文件已保存: {save_path}")
     
     def close(self):
         """关闭工作簿"""
         if self.wb:
             self.wb.close()
-            print("工作簿已关闭")
+            logger.debug("工作簿已关闭")
     
     def __enter__(self):
         """上下文管理器入口"""
@@ -225,44 +338,46 @@ class TestCaseExcelManager:
         return False
 
 
+def _rows_to_dicts(rows: List[tuple]) -> List[Dict[str, Any]]:
+    """
+    将按 COLUMNS 顺序排列的原始值元组转换为测试用例字典，空值转换为空字符串
+    
+    Args:
+        rows: read_testcases_raw 返回的元组列表
+    
+    Returns:
+        测试用例字典列表
+    """
+    columns = TestCaseExcelManager.COLUMNS
+    return [dict(zip(columns, ("" if v is None else v for v in row))) for row in rows]
+
+
 class TestCaseExcelCreator:
     """测试用例Excel创建器"""
     
+    # 表头样式
+    # 字体：宋体，14号，加粗
+    _HEADER_FONT = Font(name='宋体', size=14, bold=True)
+    # 对齐：水平居中，垂直居中，自动换行
+    _HEADER_ALIGN = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    # 边框：细线
+    _THIN = Side(style='thin')
+    _HEADER_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+    
     def __init__(self):
         self.wb = None
         self.ws = None
     
-    def _get_header_style(self):
-        """获取表头样式"""
-        # 字体：宋体，14号，加粗
-        font = Font(name='宋体', size=14, bold=True)
-        
-        # 对齐：水平居中，垂直居中，自动换行
-        alignment = Alignment(
-            horizontal='center',
-            vertical='center',
-            wrap_text=True
-        )
-        
-        # 边框：细线
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        return {'font': font, 'alignment': alignment, 'border': thin_border}
-    
-    def _apply_header_style(self):
-        """应用表头样式到第一行"""
-        header_style = self._get_header_style()
-        
-        for col_idx, col_name in enumerate(TestCaseExcelManager.COLUMNS, 1):
-            cell = self.ws.cell(row=1, column=col_idx)
-            cell.font = header_style['font']
-            cell.alignment = header_style['alignment']
-            cell.border = header_style['border']
+    def _header_cells(self) -> List[WriteOnlyCell]:
+        """生成带样式的表头单元格"""
+        cells = []
+        for col_name in TestCaseExcelManager.COLUMNS:
+            cell = WriteOnlyCell(self.ws, value=col_name)
+            cell.font = self._HEADER_FONT
+            cell.alignment = self._HEADER_ALIGN
+            cell.border = self._HEADER_BORDER
+            cells.append(cell)
+        return cells
     
     def create_new_file(self, testcases: List[Dict[str, Any]], output_path: str) -> bool:
         """
@@ -276,57 +391,50 @@ class TestCaseExcelCreator:
             是否成功
         """
         try:
-            # 创建新工作簿
-            self.wb = Workbook()
-            self.ws = self.wb.active
-            self.ws.title = "模版"
+            # 创建新工作簿（只写模式，按行流式写入）
+            self.wb = Workbook(write_only=True)
+            self.ws = self.wb.create_sheet("模版")
             
-            # 设置表头
-            for col_idx, col_name in enumerate(TestCaseExcelManager.COLUMNS, 1):
-                self.ws.cell(row=1, column=col_idx, value=col_name)
-            
-            # 应用表头样式
-            self._apply_header_style()
-            
-            # 写入数据
-            for row_idx, testcase in enumerate(testcases, start=2):
-                for col_idx, col_name in enumerate(TestCaseExcelManager.COLUMNS, 1):
+            # 整理数据行，同时计算每列最长内容（包括表头）
+            columns = TestCaseExcelManager.COLUMNS
+            max_widths = [len(col_name) for col_name in columns]
+            rows = []
+            for testcase in testcases:
+                row = []
+                for i, col_name in enumerate(columns):
                     value = testcase.get(col_name, "")
-                    # 处理NaN值
-                    if pd.isna(value):
+                    # 处理空值
+                    if value is None:
                         value = ""
-                    self.ws.cell(row=row_idx, column=col_idx, value=value)
+                    row.append(value)
+                    text = str(value)
+                    # 考虑换行，按行计算
+                    w = max(map(len, text.split('\n'))) if '\n' in text else len(text)
+                    if w > max_widths[i]:
+                        max_widths[i] = w
+                rows.append(row)
             
-            # 设置列宽（根据内容自动调整）
-            self._adjust_column_width()
+            # 设置列宽（每个中文字符占2个单位）
+            # 只写模式下列宽必须在写入第一行之前设置
+            for i, width in enumerate(max_widths):
+                self.ws.column_dimensions[_COL_LETTERS[i]].width = width * 1.2 + 4
+            
+            # 设置表头
+            self.ws.append(self._header_cells())
+            
+            # 写入数据
+            for row in rows:
+                self.ws.append(row)
             
             # 保存文件
             self.wb.save(output_path)
-            print(f"成功创建文件: {output_path}")
-            print(f"包含 {len(testcases)} 条测试用例")
+            logger.debug(f"成功创建文件: {output_path}")
+            logger.debug(f"包含 {len(testcases)} 条测试用例")
             return True
             
         except Exception as e:
-            print(f"创建文件失败: {e}")
+            logger.error(f"创建文件失败: {e}")
             return False
-    
-    def _adjust_column_width(self):
-        """根据内容自动调整列宽"""
-        for col_idx in range(1, len(TestCaseExcelManager.COLUMNS) + 1):
-            # 查找该列中最长的内容
-            max_length = 0
-            for row in range(1, self.ws.max_row + 1):
-                cell = self.ws.cell(row=row, column=col_idx)
-                if cell.value:
-                    value = str(cell.value)
-                    # 考虑换行，按行计算
-                    lines = value.split('\n')
-                    max_line_length = max(len(line) for line in lines)
-                    max_length = max(max_length, max_line_length)
-            
-            # 设置列宽（每个中文字符占2个单位）
-            column_letter = chr(64 + col_idx)  # A, B, C...
-            self.ws.column_dimensions[column_letter].width = max_length * 1.2 + 4
 
 
 def validate_testcase(testcase: Dict[str, Any]) -> List[str]:
@@ -386,6 +494,7 @@ def print_testcase(testcase: Dict[str, Any], idx: Optional[int] = None):
 
 if __name__ == "__main__":
     # 示例使用
+    logging.basicConfig(level=logging.DEBUG)
     
     # 1. 读取现有文件
     print("=" * 80)
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 import asyncio
+import json
 import logging
 import sys
+from functools import lru_cache
 from typing import Any, Sequence
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 import requests
 from mcp.server import Server
 from mcp.types import Tool, TextContent
@@ -15,15 +17,13 @@ logger = logging.getLogger("holiday-query-server")
 
 # 导入工作日查询模块
 HAS_API = False
-api_is_workday = None
-api_get_holiday_data = None
-workday_config = None
+api_get_year_index = None
+api_aget_year_index = None
 
 try:
     import workday
-    api_is_workday = workday.is_workday
-    api_get_holiday_data = workday.get_holiday_data
-    workday_config = workday.config
+    api_get_year_index = workday.get_year_index
+    api_aget_year_index = workday.aget_year_index
     HAS_API = True
     logger.info("成功导入workday模块")
 except ImportError as e:
@@ -36,6 +36,37 @@ except Exception as e:
 # 创建服务器实例
 server = Server("holiday-query")
 
+# 批量校验时同时进行的年份数据请求数上限
+PREFETCH_CONCURRENCY = 4
+
+def _fmt(d: date) -> str:
+    """将日期格式化为 YYYY-MM-DD 字符串（比 strftime 更快）"""
+    return f"{d.year:04d}-{d.month:02d}-{d.day:02d}"
+
+@lru_cache(maxsize=8192)
+def _parse_ymd(date_str: str) -> date:
+    """解析 YYYY-MM-DD 格式的日期字符串
+    
+    标准格式直接按位置切片解析，其余情况交给 strptime，保持原有的容错与错误信息。
+    
+    Args:
+        date_str: 日期字符串
+        
+    Returns:
+        date: 日期对象
+        
+    Raises:
+        ValueError: 日期格式错误
+    """
+    if len(date_str) == 10 and date_str[4] == "-" and date_str[7] == "-":
+        year, month, day = date_str[0:4], date_str[5:7], date_str[8:10]
+        if year.isdigit() and month.isdigit() and day.isdigit():
+            try:
+                return date(int(year), int(month), int(day))
+            except ValueError:
+                pass
+    return datetime.strptime(date_str, "%Y-%m-%d").date()
+
 # 基础节假日数据结构
 class HolidayData:
     def __init__(self):
@@ -43,8 +74,12 @@ class HolidayData:
         # 格式：{year: {date_str: is_holiday}}
         # is_holiday=True 表示是节假日，is_holiday=False 表示是调休（需要上班）
         self.holidays = {}
+        # 查询用的集合形式：{year: (法定节假日集合, 调休上班日集合)}
+        self._holiday_sets: dict[int, tuple[frozenset[str], frozenset[str]]] = {}
         # 初始化2026年数据
         self._init_2026_holidays()
+        # 是否联网查询在导入时已确定，构造时直接绑定对应实现，避免每次调用再做判断
+        self.is_holiday = self._is_holiday_api if HAS_API else self._is_holiday_local
     
     def _init_2026_holidays(self):
         """初始化2026年节假日数据"""
@@ -102,52 +137,73 @@ class HolidayData:
             # "2026-09-26": False,  # 周六调休
             # "2026-10-11": False,  # 周日调休
         }
+        self._build_holiday_sets(2026)
+    
+    def _build_holiday_sets(self, year: int):
+        """将指定年份的节假日字典拆分为节假日集合和调休上班日集合"""
+        days = self.holidays[year]
+        self._holiday_sets[year] = (
+            frozenset(d for d, is_holiday in days.items() if is_holiday),
+            frozenset(d for d, is_holiday in days.items() if not is_holiday),
+        )
     
-    def is_holiday(self, date_obj: date) -> tuple[bool, str]:
-        """判断指定日期是否为节假日
+    def _is_holiday_api(self, date_obj: date, year_index: dict[str, bool] | None = None) -> tuple[bool, str]:
+        """联网判断指定日期是否为节假日，查询失败时回退到本地数据
         
         Args:
             date_obj: 日期对象
+            year_index: 已获取的该年份假期索引，未提供时按年份查询
             
         Returns:
             tuple[bool, str]: (是否为节假日, 节假日类型)
         """
-        date_str = date_obj.strftime("%Y-%m-%d")
-        year = date_obj.year
-        
-        # 优先使用联网查询
-        if HAS_API:
+        if year_index is None:
             try:
-                # 调用API检查是否为工作日
-                is_work_day = api_is_workday(date_obj)
-                weekday = date_obj.weekday()
-                
-                if is_work_day:
-                    # 是工作日
-                    if weekday in [5, 6]:  # 周六=5, 周日=6
-                        return False, "调休（需上班）"
-                    return False, "工作日"
-                else:
-                    # 不是工作日（休息日）
-                    if weekday in [5, 6]:  # 周六=5, 周日=6
-                        return True, "周末"
-                    # 平日但不是工作日，是特殊假期
-                    return True, "休息日"
+                # 从整年的假期索引中查找，同一年份只请求和解析一次
+                year_index = api_get_year_index(date_obj.year)
             except Exception as e:
                 logger.warning(f"联网查询失败，回退到本地数据: {e}")
+        if not year_index:
+            return self._is_holiday_local(date_obj)
         
-        # 回退到本地数据
+        is_weekend = date_obj.weekday() >= 5  # 周六=5, 周日=6
+        is_work_day = year_index.get(_fmt(date_obj))
+        if is_work_day is None:
+            # 不在例外列表中，按默认规则判断：周一到周五是工作日
+            is_work_day = not is_weekend
+        
+        if is_work_day:
+            # 是工作日
+            if is_weekend:
+                return False, "调休（需上班）"
+            return False, "工作日"
+        else:
+            # 不是工作日（休息日）
+            if is_weekend:
+                return True, "周末"
+            # 平日但不是工作日，是特殊假期
+            return True, "休息日"
+    
+    def _is_holiday_local(self, date_obj: date) -> tuple[bool, str]:
+        """根据本地数据判断指定日期是否为节假日
+        
+        Args:
+            date_obj: 日期对象
+            
+        Returns:
+            tuple[bool, str]: (是否为节假日, 节假日类型)
+        """
         # 检查是否在法定节假日列表中
-        if year in self.holidays and date_str in self.holidays[year]:
-            is_holiday = self.holidays[year][date_str]
-            if is_holiday:
+        sets = self._holiday_sets.get(date_obj.year)
+        if sets:
+            date_str = _fmt(date_obj)
+            if date_str in sets[0]:
                 return True, "法定节假日"
-            else:
+            if date_str in sets[1]:
                 return False, "调休（需上班）"
         
         # 检查是否为周末
-        weekday = date_obj.weekday()
-        if weekday in [5, 6]:  # 周六=5, 周日=6
+        if date_obj.weekday() >= 5:  # 周六=5, 周日=6
             return True, "周末"
         
         # 默认为工作日
@@ -162,42 +218,48 @@ class HolidayData:
         Returns:
             list[str]: 节假日日期列表（YYYY-MM-DD格式）
         """
-        holidays = []
+        # 例外日期：{日期字符串: 是否为节假日}，不在其中的日期按周末规则判断
+        override = None
         
-        # 优先使用联网查询
+        # 优先使用联网查询，全年数据只请求一次
         if HAS_API:
             try:
-                # 调用API获取假期数据
-                holiday_data = api_get_holiday_data(year, workday_config.open_plat, workday_config.center_url, workday_config.app_id, workday_config.app_secret)
+                # 调用API获取整年的假期索引
+                year_index = api_get_year_index(year)
                 
-                if holiday_data:
-                    # 生成全年日期并检查每个日期
-                    start_date = date(year, 1, 1)
-                    end_date = date(year, 12, 31)
-                    current_date = start_date
-                    
-                    while current_date <= end_date:
-                        is_holiday, _ = self.is_holiday(current_date)
-                        if is_holiday:
-                            holidays.append(current_date.strftime("%Y-%m-%d"))
-                        current_date += timedelta(days=1)
-                    return holidays
+                if year_index:
+                    override = {ds: not is_work_day for ds, is_work_day in year_index.items()}
             except Exception as e:
                 logger.warning(f"联网获取节假日列表失败，回退到本地数据: {e}")
         
         # 回退到本地数据
-        # 生成全年日期
-        start_date = date(year, 1, 1)
-        end_date = date(year, 12, 31)
-        current_date = start_date
+        if override is None:
+            override = self.holidays.get(year, {})
         
-        while current_date <= end_date:
-            is_holiday, _ = self.is_holiday(current_date)
+        start_ord = date(year, 1, 1).toordinal()
+        end_ord = date(year, 12, 31).toordinal()
+        start_weekday = date(year, 1, 1).weekday()
+        
+        # 第一遍：按1月1日的星期直接算出全年的周六、周日，不需要逐日查表
+        first_saturday = start_ord + (5 - start_weekday) % 7
+        first_sunday = start_ord + (6 - start_weekday) % 7
+        holiday_ords = set(range(first_saturday, end_ord + 1, 7))
+        holiday_ords.update(range(first_sunday, end_ord + 1, 7))
+        
+        # 第二遍：应用例外日期，加入平日假期，去掉调休上班的周末
+        for date_str, is_holiday in override.items():
+            try:
+                ordinal = _parse_ymd(date_str).toordinal()
+            except (TypeError, ValueError):
+                continue
+            if not start_ord <= ordinal <= end_ord:
+                continue
             if is_holiday:
-                holidays.append(current_date.strftime("%Y-%m-%d"))
-            current_date += timedelta(days=1)
+                holiday_ords.add(ordinal)
+            else:
+                holiday_ords.discard(ordinal)
         
-        return holidays
+        return [_fmt(date.fromordinal(ordinal)) for ordinal in sorted(holiday_ords)]
 
 # 创建节假日数据实例
 holiday_data = HolidayData()
@@ -263,11 +325,43 @@ async def handle_list_tools() -> list[Tool]:
         )
     ]
 
+async def _prefetch_year(year: int) -> dict[str, bool] | None:
+    """异步预取指定年份的假期索引，使随后的同步查询直接命中缓存而不阻塞事件循环
+    
+    Returns:
+        该年份的假期索引，未启用联网查询或获取失败时返回 None
+    """
+    if not HAS_API:
+        return None
+    try:
+        return await api_aget_year_index(year)
+    except Exception as e:
+        logger.warning(f"预取{year}年假期数据失败: {e}")
+        return None
+
+async def _prefetch_years(years: set[int]) -> dict[int, dict[str, bool] | None]:
+    """并发预取多个年份的假期索引，同时进行的请求数不超过 PREFETCH_CONCURRENCY
+    
+    年份数可能超过索引缓存的容量，因此直接返回结果供调用方使用，而不是依赖缓存命中
+    
+    Returns:
+        dict: {年份: 假期索引或 None}
+    """
+    semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+    
+    async def _fetch(year: int) -> dict[str, bool] | None:
+        async with semaphore:
+            return await _prefetch_year(year)
+    
+    years = list(years)
+    return dict(zip(years, await asyncio.gather(*(_fetch(year) for year in years))))
+
 async def is_holiday(date_str: str) -> dict:
     """判断指定日期是否为节假日"""
     try:
         # 解析日期
-        date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+        date_obj = _parse_ymd(date_str)
+        await _prefetch_year(date_obj.year)
         
         # 使用 HolidayData 类判断是否为节假日
         is_holiday_flag, holiday_type = holiday_data.is_holiday(date_obj)
@@ -290,6 +384,8 @@ async def is_holiday(date_str: str) -> dict:
 async def get_holidays(year: int) -> dict:
     """获取指定年份的节假日列表"""
     try:
+        await _prefetch_year(year)
+        
         # 使用 HolidayData 类获取节假日列表
         holidays = holiday_data.get_holidays(year)
         
@@ -321,6 +417,18 @@ async def validate_date_status(date_records: list[dict]) -> dict:
         valid_records = []
         invalid_records = []
         
+        # 先收集记录涉及的年份，并发预取各年份的假期数据
+        years = set()
+        for record in date_records:
+            try:
+                years.add(_parse_ymd(record.get("date")).year)
+            except (TypeError, ValueError):
+                continue
+        year_indexes = await _prefetch_years(years)
+        
+        # 相同日期只判断一次：{日期: (是否为节假日, 节假日类型)}
+        resolved = {}
+        
         for record in date_records:
             date_str = record.get("date")
             status = record.get("status")
@@ -335,10 +443,17 @@ async def validate_date_status(date_records: list[dict]) -> dict:
             
             try:
                 # 解析日期
-                date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+                date_obj = _parse_ymd(date_str)
                 
                 # 获取实际的节假日状态
-                is_holiday_flag, holiday_type = holiday_data.is_holiday(date_obj)
+                if date_obj not in resolved:
+                    year_index = year_indexes.get(date_obj.year)
+                    if year_index is not None:
+                        # 直接使用预取到的索引，不再经过缓存（年份较多时缓存可能已被淘汰）
+                        resolved[date_obj] = holiday_data._is_holiday_api(date_obj, year_index)
+                    else:
+                        resolved[date_obj] = holiday_data.is_holiday(date_obj)
+                is_holiday_flag, holiday_type = resolved[date_obj]
                 
                 # 根据规则验证状态
                 # 规则：工作日状态应为 true，休息日状态应为 false
@@ -397,38 +512,52 @@ async def validate_date_status(date_records: list[dict]) -> dict:
             "error": f"验证日期状态时发生错误: {str(e)}"
         }
 
+# 工具结果以紧凑JSON返回
+try:
+    import orjson
+
+    def _dump(data: Any) -> str:
+        return orjson.dumps(data).decode("utf-8")
+except ImportError:
+    def _dump(data: Any) -> str:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: dict | None) -> list[TextContent]:
     """处理工具调用"""
     if name == "is_holiday":
         if not arguments or "date" not in arguments:
-            return [TextContent(type="text", text=str({"error": "缺少 date 参数"}))]
+            return [TextContent(type="text", text=_dump({"error": "缺少 date 参数"}))]
         date_str = arguments["date"]
         result = await is_holiday(date_str)
-        return [TextContent(type="text", text=str(result))]
+        return [TextContent(type="text", text=_dump(result))]
     elif name == "get_holidays":
         if not arguments or "year" not in arguments:
-            return [TextContent(type="text", text=str({"error": "缺少 year 参数"}))]
+            return [TextContent(type="text", text=_dump({"error": "缺少 year 参数"}))]
         year = arguments["year"]
         result = await get_holidays(year)
-        return [TextContent(type="text", text=str(result))]
+        return [TextContent(type="text", text=_dump(result))]
     elif name == "validate_date_status":
         if not arguments or "date_records" not in arguments:
-            return [TextContent(type="text", text=str({"error": "缺少 date_records 参数"}))]
+            return [TextContent(type="text", text=_dump({"error": "缺少 date_records 参数"}))]
         date_records = arguments["date_records"]
         result = await validate_date_status(date_records)
-        return [TextContent(type="text", text=str(result))]
+        return [TextContent(type="text", text=_dump(result))]
     else:
         raise ValueError(f"未知工具: {name}")
 
 async def main():
     """主函数"""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        if HAS_API:
+            await workday.close_session()
 
 if __name__ == "__main__":
     # 初始化节假日数据
@@ -1,10 +1,15 @@
 
+import asyncio
 import os
 import sys
+import tempfile
+import threading
 import time
 import hmac
 import hashlib
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 import traceback
 import json
@@ -13,9 +18,58 @@ import logging
 from typing import Union, Optional, Dict, Any, List
 from functools import lru_cache
 
+# 跨进程文件锁：POSIX 使用 fcntl，Windows 使用 msvcrt
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# 默认只输出警告及以上级别，调试时可调低
+logger.setLevel(logging.WARNING)
+
+# 共享的HTTP会话：复用连接池，连接失败时自动重试
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.1))
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# 可选的异步HTTP客户端，未安装时异步接口回退到线程池中执行同步请求
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    aiohttp = None
+    HAS_AIOHTTP = False
+
+# 共享的 aiohttp 会话，在事件循环中首次使用时创建并绑定到该循环
+_AIO_SESSION = None
+_AIO_LOOP = None
+
+# 访问令牌缓存：{(center_url, app_id, app_secret): (令牌, 过期时间戳)}
+TOKEN_DEFAULT_TTL = 3600  # 响应未给出 expires_in 时的默认有效期（秒）
+TOKEN_REFRESH_MARGIN = 60  # 提前刷新的秒数
+_TOKEN_CACHE: Dict[tuple, tuple] = {}
+_TOKEN_LOCK = threading.Lock()
+_AIO_TOKEN_LOCK = None
+
+# 按年份缓存的假期索引：{(year, base_url, center_url, app_id, app_secret): 索引}
+INDEX_CACHE_SIZE = 10
+_INDEX_CACHE: Dict[tuple, Dict[str, bool]] = {}
+# 获取失败的年份在短时间内不再重试，之后重新请求：{缓存键: 可重试的时间戳}
+INDEX_RETRY_DELAY = 60  # 秒
+_INDEX_FAILURES: Dict[tuple, float] = {}
+
+# 磁盘缓存：进程重启后仍可复用假期数据（访问令牌只保存在内存中，不写入磁盘）
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "holiday_query_mcp")
+YEAR_CACHE_TTL = 30 * 24 * 3600  # 假期数据缓存有效期（秒）
+YEAR_CACHE_VERSION = 1  # 缓存文件格式版本，格式或接口变化时递增使旧缓存失效
 
 class WorkDayConfig:
     """工作日配置类，管理环境配置和敏感信息"""
@@ -56,17 +110,125 @@ def http_post_json(post_url: str, json_data: Dict[str, Any], headers: Optional[D
         响应文本，失败时返回None
     """
     try:
-        response = requests.post(post_url, json=json_data, headers=headers, timeout=10)
+        response = _SESSION.post(post_url, json=json_data, headers=headers, timeout=10)
         response.raise_for_status()
         return response.text
     except requests.exceptions.RequestException as e:
         logger.error(f"HTTP POST请求失败 [{post_url}]: {str(e)}")
         return None
 
-@lru_cache(maxsize=1)
+def _token_key(center_url: str, app_id: str, app_secret: str) -> tuple:
+    return (center_url, app_id, app_secret)
+
+def _read_disk_cache(name: str) -> Optional[Dict[str, Any]]:
+    """读取磁盘缓存文件，不存在或内容损坏时返回None"""
+    try:
+        with open(os.path.join(CACHE_DIR, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_disk_cache(name: str, data: Dict[str, Any]) -> None:
+    """
+    原子地写入磁盘缓存文件
+    
+    先写入同目录下的临时文件再 os.replace 替换，读取方不会看到写了一半的文件；
+    多个进程同时写入时通过文件锁（fcntl.flock / msvcrt.locking）串行化。
+    
+    Args:
+        name: 缓存文件名
+        data: 要写入的数据
+    """
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, name)
+        with open(f"{path}.lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(data, f, ensure_ascii=False)
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+            finally:
+                if fcntl is None and msvcrt is not None:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    except OSError as e:
+        logger.warning(f"写入缓存文件失败 [{name}]: {str(e)}")
+
+def _year_cache_name(year: int, base_url: str, app_id: str) -> str:
+    """假期数据缓存文件名，不同环境和应用的数据分开保存"""
+    digest = hashlib.sha1(f"{YEAR_CACHE_VERSION}|{base_url}|{app_id}".encode("utf-8")).hexdigest()[:12]
+    return f"{year}-{digest}.json"
+
+def _load_year_cache(year: int, base_url: str, app_id: str) -> Optional[List[Dict[str, Any]]]:
+    """读取磁盘上未过期的假期数据，不存在、已过期、版本或环境不一致时返回None"""
+    cached = _read_disk_cache(_year_cache_name(year, base_url, app_id))
+    if not cached or cached.get("version") != YEAR_CACHE_VERSION:
+        return None
+    if cached.get("base_url") != base_url or cached.get("app_id") != app_id:
+        return None
+    if time.time() - cached.get("fetched_at", 0) > YEAR_CACHE_TTL:
+        return None
+    return cached.get("data")
+
+def _save_year_cache(year: int, base_url: str, app_id: str, holiday_data: List[Dict[str, Any]]) -> None:
+    """将假期数据写入磁盘缓存"""
+    _write_disk_cache(_year_cache_name(year, base_url, app_id), {
+        "version": YEAR_CACHE_VERSION,
+        "base_url": base_url,
+        "app_id": app_id,
+        "fetched_at": time.time(),
+        "data": holiday_data
+    })
+
+def _cached_token(key: tuple) -> Optional[str]:
+    """返回未过期的缓存令牌，不存在或已过期时返回None"""
+    entry = _TOKEN_CACHE.get(key)
+    if entry and entry[1] > time.time():
+        return entry[0]
+    return None
+
+def _parse_token(key: tuple, response: str) -> Optional[str]:
+    """
+    解析访问令牌响应并写入缓存
+    
+    Args:
+        key: 令牌缓存键
+        response: 认证接口的响应文本
+        
+    Returns:
+        访问令牌，失败时返回None
+    """
+    try:
+        token_data = json.loads(response)
+        if "data" not in token_data or "access_token" not in token_data["data"]:
+            logger.error("访问令牌响应格式不正确")
+            return None
+        token = token_data["data"]["access_token"]
+        expires_in = token_data["data"].get("expires_in") or TOKEN_DEFAULT_TTL
+    except (json.JSONDecodeError, KeyError, AttributeError) as e:
+        logger.error(f"解析访问令牌失败: {str(e)}")
+        return None
+
+    # 提前一段时间视为过期，避免请求途中令牌失效
+    ttl = max(float(expires_in) - TOKEN_REFRESH_MARGIN, 0)
+    _TOKEN_CACHE[key] = (token, time.time() + ttl)
+    return token
+
+def invalidate_access_token(center_url: str, app_id: str, app_secret: str) -> None:
+    """使缓存的访问令牌失效（如服务端返回401时）"""
+    _TOKEN_CACHE.pop(_token_key(center_url, app_id, app_secret), None)
+
 def get_access_token(center_url: str, app_id: str, app_secret: str) -> Optional[str]:
     """
-    获取机器人访问令牌（带缓存）
+    获取机器人访问令牌（按有效期缓存）
     
     Args:
         center_url: 认证中心URL
@@ -79,35 +241,36 @@ def get_access_token(center_url: str, app_id: str, app_secret: str) -> Optional[
     if not app_id:
         logger.error("应用ID为空")
         return None
-        
-    url = f"{center_url}/api/auth/v1/robot/GetRobotAccessToken"
-    payload = {
-        "robot_guid": app_id,
-        "robot_secret": app_secret
-    }
-    headers = {
-        "Content-Type": "application/json"
-    }
-    
-    response = http_post_json(url, json_data=payload, headers=headers)
-    if not response:
-        return None
 
-    try:
-        token_data = json.loads(response)
-        if "data" not in token_data or "access_token" not in token_data["data"]:
-            logger.error("访问令牌响应格式不正确")
+    key = _token_key(center_url, app_id, app_secret)
+    token = _cached_token(key)
+    if token:
+        return token
+
+    with _TOKEN_LOCK:
+        # 等锁期间其他线程可能已刷新令牌
+        token = _cached_token(key)
+        if token:
+            return token
+
+        url = f"{center_url}/api/auth/v1/robot/GetRobotAccessToken"
+        payload = {
+            "robot_guid": app_id,
+            "robot_secret": app_secret
+        }
+        headers = {
+            "Content-Type": "application/json"
+        }
+
+        response = http_post_json(url, json_data=payload, headers=headers)
+        if not response:
             return None
-        return token_data["data"]["access_token"]
-    except (json.JSONDecodeError, KeyError) as e:
-        logger.error(f"解析访问令牌失败: {str(e)}")
-        return None
+        return _parse_token(key, response)
 
 
-@lru_cache(maxsize=10)
 def get_holiday_data(year: int, base_url: str, center_url: str, app_id: str, app_secret: str) -> Optional[List[Dict[str, Any]]]:
     """
-    获取指定年份的假期数据（带缓存）
+    获取指定年份的假期数据（每次调用都会请求接口，缓存见 _fetch_year_data）
     
     Args:
         year: 年份
@@ -122,13 +285,20 @@ def get_holiday_data(year: int, base_url: str, center_url: str, app_id: str, app
     query = {"start_year": year, "end_year": year}
     api_url = f"{base_url}/api/cal/holiday/list"
 
-    access_token = get_access_token(center_url, app_id, app_secret)
-    if not access_token:
-        logger.error("获取访问令牌失败")
-        return None
-
     try:
-        response = requests.get(api_url, params=query, headers={"Authorization": access_token}, timeout=10)
+        # 令牌被服务端拒绝（401）时刷新一次后重试
+        for attempt in range(2):
+            access_token = get_access_token(center_url, app_id, app_secret)
+            if not access_token:
+                logger.error("获取访问令牌失败")
+                return None
+
+            response = _SESSION.get(api_url, params=query, headers={"Authorization": access_token}, timeout=10)
+            if response.status_code != 401 or attempt:
+                break
+            logger.warning("访问令牌已失效，重新获取")
+            invalidate_access_token(center_url, app_id, app_secret)
+
         response.raise_for_status()
         data = json.loads(response.text)
         
@@ -141,13 +311,250 @@ def get_holiday_data(year: int, base_url: str, center_url: str, app_id: str, app
         logger.error(f"获取假期数据失败: {str(e)}")
         return None
 
-def get_work_day(year: int, timestamp: int, base_url: Optional[str] = None, tag: Optional[str] = None) -> Union[bool, List[Dict[str, Any]], None]:
+def _date_key(value: Any) -> Optional[str]:
+    """
+    将假期数据中的日期统一转换为 YYYY-MM-DD 字符串
+    
+    Args:
+        value: 日期字符串（YYYY-MM-DD开头）、时间戳（秒/毫秒）或日期对象
+        
+    Returns:
+        YYYY-MM-DD 格式的日期字符串，无法识别时返回None
+    """
+    if isinstance(value, datetime.date):
+        return value.isoformat()[:10]
+    if isinstance(value, str):
+        if not value.isdigit():
+            return value[:10]
+        value = int(value)
+    if isinstance(value, (int, float)):
+        # 大于 1e11 的按毫秒时间戳处理
+        if value > 1e11:
+            value = value / 1000
+        return datetime.date.fromtimestamp(value).isoformat()
+    return None
+
+def _build_index(holiday_data: Optional[List[Dict[str, Any]]]) -> Optional[Dict[str, bool]]:
+    """将假期数据列表转换为 {YYYY-MM-DD: 是否为工作日} 字典"""
+    if holiday_data is None:
+        return None
+    # 接口返回的日期可能是字符串或时间戳，统一转换为 YYYY-MM-DD 作为键
+    return {_date_key(item["date"]): item["is_work_day"] for item in holiday_data}
+
+def _recently_failed(key: tuple) -> bool:
+    """该年份最近是否获取失败（仍在重试间隔内）"""
+    return time.time() < _INDEX_FAILURES.get(key, 0)
+
+def _store_index(key: tuple, index: Optional[Dict[str, bool]]) -> Optional[Dict[str, bool]]:
+    """写入假期索引缓存，超出容量时淘汰最早写入的年份
+    
+    获取失败（None）不写入缓存，只记录失败时间，重试间隔过后再次请求
+    """
+    if index is None:
+        _INDEX_FAILURES[key] = time.time() + INDEX_RETRY_DELAY
+        return None
+    _INDEX_FAILURES.pop(key, None)
+    if key not in _INDEX_CACHE and len(_INDEX_CACHE) >= INDEX_CACHE_SIZE:
+        _INDEX_CACHE.pop(next(iter(_INDEX_CACHE)))
+    _INDEX_CACHE[key] = index
+    return index
+
+def _fetch_year_data(year: int, base_url: str, center_url: str, app_id: str, app_secret: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    获取指定年份的假期数据，优先使用磁盘缓存，只缓存获取成功的结果
+    
+    Args:
+        year: 年份
+        base_url: 基础URL
+        center_url: 认证中心URL
+        app_id: 应用ID
+        app_secret: 应用密钥
+        
+    Returns:
+        假期数据列表，失败时返回None
+    """
+    holiday_data = _load_year_cache(year, base_url, app_id)
+    if holiday_data is None:
+        holiday_data = get_holiday_data(year, base_url, center_url, app_id, app_secret)
+        if holiday_data is not None:
+            _save_year_cache(year, base_url, app_id, holiday_data)
+    return holiday_data
+
+def _holiday_index(year: int, base_url: str, center_url: str, app_id: str, app_secret: str) -> Optional[Dict[str, bool]]:
+    """
+    获取指定年份的假期索引（带缓存），每年只构建一次
+    
+    Args:
+        year: 年份
+        base_url: 基础URL
+        center_url: 认证中心URL
+        app_id: 应用ID
+        app_secret: 应用密钥
+        
+    Returns:
+        {YYYY-MM-DD: 是否为工作日} 字典，失败时返回None
+    """
+    key = (year, base_url, center_url, app_id, app_secret)
+    if key in _INDEX_CACHE:
+        return _INDEX_CACHE[key]
+    if _recently_failed(key):
+        return None
+    return _store_index(key, _build_index(_fetch_year_data(*key)))
+
+def _get_session():
+    """获取共享的 aiohttp 会话（需在事件循环中调用）"""
+    global _AIO_SESSION, _AIO_LOOP, _AIO_TOKEN_LOCK
+    loop = asyncio.get_running_loop()
+    if _AIO_SESSION is None or _AIO_SESSION.closed or _AIO_LOOP is not loop:
+        _AIO_SESSION = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        _AIO_LOOP = loop
+        _AIO_TOKEN_LOCK = asyncio.Lock()
+    return _AIO_SESSION
+
+async def close_session() -> None:
+    """关闭共享的 aiohttp 会话"""
+    global _AIO_SESSION, _AIO_LOOP
+    if _AIO_SESSION is not None and not _AIO_SESSION.closed:
+        await _AIO_SESSION.close()
+    _AIO_SESSION = None
+    _AIO_LOOP = None
+
+async def _aget_access_token(session, center_url: str, app_id: str, app_secret: str) -> Optional[str]:
+    """
+    异步获取机器人访问令牌（与同步接口共用按有效期的缓存）
+    
+    Args:
+        session: aiohttp 会话
+        center_url: 认证中心URL
+        app_id: 应用ID
+        app_secret: 应用密钥
+        
+    Returns:
+        访问令牌，失败时返回None
+    """
+    if not app_id:
+        logger.error("应用ID为空")
+        return None
+
+    key = _token_key(center_url, app_id, app_secret)
+    token = _cached_token(key)
+    if token:
+        return token
+
+    # 并发请求只由一个协程刷新令牌
+    async with _AIO_TOKEN_LOCK:
+        token = _cached_token(key)
+        if token:
+            return token
+
+        url = f"{center_url}/api/auth/v1/robot/GetRobotAccessToken"
+        payload = {
+            "robot_guid": app_id,
+            "robot_secret": app_secret
+        }
+
+        try:
+            async with session.post(url, json=payload) as response:
+                response.raise_for_status()
+                text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"HTTP POST请求失败 [{url}]: {str(e)}")
+            return None
+        return _parse_token(key, text)
+
+async def _aget_holiday_data(session, year: int, base_url: str, center_url: str, app_id: str, app_secret: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    异步获取指定年份的假期数据
+    
+    Args:
+        session: aiohttp 会话
+        year: 年份
+        base_url: 基础URL
+        center_url: 认证中心URL
+        app_id: 应用ID
+        app_secret: 应用密钥
+        
+    Returns:
+        假期数据列表，失败时返回None
+    """
+    query = {"start_year": year, "end_year": year}
+    api_url = f"{base_url}/api/cal/holiday/list"
+
+    try:
+        # 令牌被服务端拒绝（401）时刷新一次后重试
+        for attempt in range(2):
+            access_token = await _aget_access_token(session, center_url, app_id, app_secret)
+            if not access_token:
+                logger.error("获取访问令牌失败")
+                return None
+
+            async with session.get(api_url, params=query, headers={"Authorization": access_token}) as response:
+                if response.status == 401 and not attempt:
+                    logger.warning("访问令牌已失效，重新获取")
+                    invalidate_access_token(center_url, app_id, app_secret)
+                    continue
+                response.raise_for_status()
+                data = json.loads(await response.text())
+                break
+
+        if "data" not in data or "business_holiday" not in data["data"]:
+            logger.error("假期数据响应格式不正确")
+            return None
+
+        return data["data"]["business_holiday"]
+    except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError, KeyError) as e:
+        logger.error(f"获取假期数据失败: {str(e)}")
+        return None
+
+async def aget_year_index(year: int) -> Optional[Dict[str, bool]]:
+    """
+    异步获取指定年份的假期索引（使用默认配置）
+
+    结果写入与同步接口共用的缓存，之后同一年份的同步查询不再发起请求。
+    未安装 aiohttp 时在线程池中执行同步请求，不阻塞事件循环。
+    
+    Args:
+        year: 年份
+        
+    Returns:
+        {YYYY-MM-DD: 是否为工作日} 字典，失败时返回None
+    """
+    key = (year, config.open_plat, config.center_url, config.app_id, config.app_secret)
+    if key in _INDEX_CACHE:
+        return _INDEX_CACHE[key]
+    if _recently_failed(key):
+        return None
+    if not HAS_AIOHTTP:
+        return await asyncio.to_thread(_holiday_index, *key)
+    # 磁盘读写和文件锁在线程池中执行，不阻塞事件循环
+    holiday_data = await asyncio.to_thread(_load_year_cache, year, config.open_plat, config.app_id)
+    if holiday_data is None:
+        holiday_data = await _aget_holiday_data(_get_session(), *key)
+        if holiday_data is not None:
+            await asyncio.to_thread(_save_year_cache, year, config.open_plat, config.app_id, holiday_data)
+    return _store_index(key, _build_index(holiday_data))
+
+def get_year_index(year: int) -> Optional[Dict[str, bool]]:
+    """
+    获取指定年份的假期索引（使用默认配置）
+
+    整年的例外日期只需一次API请求，调用方可以在本地回答该年任意日期的查询。
+    
+    Args:
+        year: 年份
+        
+    Returns:
+        {YYYY-MM-DD: 是否为工作日} 字典，失败时返回None
+    """
+    return _holiday_index(year, config.open_plat, config.center_url, config.app_id, config.app_secret)
+
+def get_work_day(year: int, timestamp: Union[int, datetime.date], base_url: Optional[str] = None, tag: Optional[str] = None) -> Union[bool, List[Dict[str, Any]], None]:
     """
     获取指定日期是否为工作日
 
     Args:
         year: 年份
-        timestamp: 时间戳（秒）
+        timestamp: 时间戳（秒），也可以直接传入 datetime.date 对象
         base_url: 基础URL（可选，默认使用配置中的URL）
         tag: 如果为"list"，返回完整的工作日列表
 
@@ -164,26 +571,56 @@ def get_work_day(year: int, timestamp: int, base_url: Optional[str] = None, tag:
     if base_url is None:
         base_url = config.open_plat
     
-    holiday_data = get_holiday_data(year, base_url, config.center_url, config.app_id, config.app_secret)
+    if tag == "list":
+        holiday_data = _fetch_year_data(year, base_url, config.center_url, config.app_id, config.app_secret)
+        if holiday_data is None:
+            logger.error("获取假期数据失败")
+        return holiday_data
+    
+    # 假期字典按年份缓存，避免每次调用都重新构建
+    holiday_dict = _holiday_index(year, base_url, config.center_url, config.app_id, config.app_secret)
     
-    if holiday_data is None:
+    if holiday_dict is None:
         logger.error("获取假期数据失败")
         return None
     
-    if tag == "list":
-        return holiday_data
-    
-    # 将假期列表转换为字典以提高查找效率
-    holiday_dict = {item["date"]: item["is_work_day"] for item in holiday_data}
+    if isinstance(timestamp, datetime.date):
+        date_obj = timestamp
+    else:
+        date_obj = datetime.date.fromtimestamp(timestamp)
     
     # 检查是否在假期列表中（记录的是例外日期）
-    if timestamp in holiday_dict:
-        return holiday_dict[timestamp]
+    is_work_day = holiday_dict.get(date_obj.isoformat()[:10])
+    if is_work_day is not None:
+        return is_work_day
 
     # 如果不在列表中，根据星期几判断默认规则
-    dt = datetime.datetime.fromtimestamp(timestamp)
-    weekday = dt.weekday()  # 0=周一, 6=周日
+    weekday = date_obj.weekday()  # 0=周一, 6=周日
     return weekday < 5  # 周一到周五是工作日
+
+@lru_cache(maxsize=4096)
+def _is_workday_cached(ordinal: int) -> bool:
+    """
+    按日期序数查询是否为工作日（带缓存）
+    
+    Args:
+        ordinal: 日期序数（datetime.date.toordinal()）
+        
+    Returns:
+        bool: 如果是工作日返回True，否则返回False
+        
+    Raises:
+        LookupError: 假期数据获取失败（抛出异常使该结果不被缓存）
+    """
+    date_obj = datetime.date.fromordinal(ordinal)
+
+    # 调用API检查是否为工作日
+    result = get_work_day(date_obj.year, date_obj)
+    if result is None:
+        raise LookupError("获取工作日信息失败")
+
+    return bool(result)
+
 def is_workday(date: Union[datetime.date, datetime.datetime]) -> bool:
     """
     检查指定日期是否为工作日
@@ -194,40 +631,34 @@ def is_workday(date: Union[datetime.date, datetime.datetime]) -> bool:
     Returns:
         bool: 如果是工作日返回True，否则返回False
     """
-    # 记录调试信息
-    logger.info(f"网址: {config.open_plat}")
-    logger.info(f"appid: {config.app_id}")
-    logger.info(f"date: {date}")
-    logger.info(f"环境: {config.is_production}")
+    # 记录调试信息（仅在启用DEBUG时格式化）
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"网址: {config.open_plat}")
+        logger.debug(f"appid: {config.app_id}")
+        logger.debug(f"date: {date}")
+        logger.debug(f"环境: {config.is_production}")
     
     try:
-        # 处理不同的日期类型
+        # 处理不同的日期类型（datetime 是 date 的子类，需先判断）
         if isinstance(date, datetime.datetime):
-            date_datetime = date
+            date_obj = date.date()
         elif isinstance(date, datetime.date):
-            date_datetime = datetime.datetime.combine(date, datetime.datetime.min.time())
+            date_obj = date
         else:
             logger.error(f"不支持的日期类型: {type(date)}")
             return False
 
-        # 获取年份和时间戳
-        year = date_datetime.year
-        timestamp = int(date_datetime.timestamp())
-
-        # 调用API检查是否为工作日
-        result = get_work_day(year, timestamp)
-
-        # 处理获取失败的情况
-        if result is None:
+        # 同一天的结果按日期序数缓存，只缓存根据假期数据得出的结果
+        try:
+            return _is_workday_cached(date_obj.toordinal())
+        except LookupError:
             logger.warning("获取工作日信息失败，根据星期几判断")
-            weekday = date_datetime.weekday()
-            return weekday < 5  # 周一到周五默认是工作日
-
-        return bool(result)
+            return date_obj.weekday() < 5  # 周一到周五默认是工作日
 
     except Exception as e:
         logger.error(f"检查工作日时发生错误: {str(e)}")
-        logger.debug(f"错误详情: {traceback.format_exc()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"错误详情: {traceback.format_exc()}")
         return False
 
 # 为了向后兼容，保留原有的全局变量访问方式